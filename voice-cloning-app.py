@@ -2,11 +2,20 @@
 
 import streamlit as st
 import numpy as np
-import librosa
 import soundfile as sf
 import io
+import os
+import hashlib
+import tempfile
+import uuid
+import atexit
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import pyworld as pw
 import pysptk
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from streamlit_mic_recorder import mic_recorder
 
 # Configure the app
@@ -16,6 +25,20 @@ st.set_page_config(
     layout="wide"
 )
 
+# WORLD / mel-cepstral analysis settings shared by template analysis and morphing
+WORLD_SAMPLE_RATE = 16000
+FRAME_PERIOD = 5.0  # ms, used for analysis/synthesis of the vocal track
+ANALYSIS_FRAME_PERIOD = 10.0  # ms, voice samples only need the mean envelope
+MCEP_ORDER = 24
+MCEP_ALPHA = 0.55
+
+# Timbre templates persisted across sessions, keyed by the voice samples they came from
+TEMPLATE_CACHE_DIR = Path.home() / ".cache" / "voice_morph"
+
+# Voice samples live in a private per-process temp dir, one subdir per session; session dirs
+# untouched for this long (abandoned tabs) are removed on the next sample write
+SAMPLE_TTL = 24 * 3600  # seconds
+
 # Initialize session state
 def init_session_state():
     if 'vocal_track' not in st.session_state:
@@ -26,53 +49,224 @@ def init_session_state():
         st.session_state.uploaded_samples = []
     if 'timbre_template' not in st.session_state:
         st.session_state.timbre_template = None
+    if 'sample_session' not in st.session_state:
+        st.session_state.sample_session = uuid.uuid4().hex
+    if 'widget_generation' not in st.session_state:
+        st.session_state.widget_generation = 0
+
+@st.cache_resource(show_spinner=False)
+def _librosa():
+    """Import librosa on first use; it pulls in numba/scipy and is slow to import"""
+    import librosa
+    return librosa
+
+def reset_session():
+    """Drop all per-session state in one step before the app reruns"""
+    shutil.rmtree(_session_sample_dir(), ignore_errors=True)
+    for key in ['vocal_track', 'voice_samples', 'uploaded_samples', 'timbre_template']:
+        st.session_state.pop(key, None)
+    
+    # Input widgets are keyed by this counter, so bumping it gives fresh, empty uploaders
+    st.session_state.widget_generation += 1
+
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def _load_audio(raw_bytes, suffix, sr=None):
+    """Decode audio bytes to mono (resampled to sr if given), cached on content so reruns skip the decode"""
+    try:
+        # libsndfile decodes WAV/FLAC/OGG (and MP3 on recent builds) straight from memory
+        audio, file_sr = sf.read(io.BytesIO(raw_bytes), dtype='float32', always_2d=False)
+        if audio.ndim == 2:
+            audio = audio.mean(axis=1, dtype=np.float32)
+    except RuntimeError:
+        # Raised by libsndfile for unsupported formats; librosa's audioread fallback needs a real file
+        with tempfile.NamedTemporaryFile(suffix=f".{suffix}", delete=False) as tmp_file:
+            tmp_file.write(raw_bytes)
+        try:
+            audio, file_sr = _librosa().load(tmp_file.name, sr=None, mono=True, dtype=np.float32)
+        finally:
+            os.unlink(tmp_file.name)
+    
+    if sr is not None and file_sr != sr:
+        audio = _librosa().resample(audio, orig_sr=file_sr, target_sr=sr, res_type='soxr_hq')
+        file_sr = sr
+    
+    # Downstream passes are memory-bound; keep a contiguous float32 buffer throughout
+    return np.ascontiguousarray(audio, dtype=np.float32), file_sr
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _encode_audio(audio, sr, format='WAV', preview=False):
+    """Encode audio as 16-bit WAV/FLAC bytes, cached so reruns don't re-encode the track"""
+    # In-browser previews don't need more than ~22 kHz; downloads keep the full rate
+    factor = sr // 22050
+    if preview and factor > 1:
+        from scipy.signal import resample_poly
+        audio = resample_poly(audio, 1, factor).astype(np.float32, copy=False)
+        sr //= factor
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sr, format=format, subtype='PCM_16')
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _resample(audio, orig_sr, target_sr):
+    """Resample audio, cached so re-morphing the same track only resamples it once"""
+    return _librosa().resample(audio, orig_sr=orig_sr, target_sr=target_sr, res_type='soxr_hq')
+
+# st.cache_resource rather than a module-level cache: Streamlit re-executes the script on
+# every rerun, so anything memoized at module level would be recreated each time
+@st.cache_resource(show_spinner=False)
+def _sample_root():
+    """Private (0700) temp dir for this server process's voice samples, removed at exit"""
+    root = Path(tempfile.mkdtemp(prefix="voice_morph_"))
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    return root
+
+def _session_sample_dir():
+    """Directory holding the current session's voice samples"""
+    return _sample_root() / st.session_state.sample_session
+
+def _sweep_stale_samples():
+    """Remove sample dirs of sessions that haven't written anything for SAMPLE_TTL"""
+    cutoff = time.time() - SAMPLE_TTL
+    for session_dir in _sample_root().iterdir():
+        try:
+            if session_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(session_dir, ignore_errors=True)
+        except OSError:
+            continue
+
+def _persist_sample(raw_bytes, suffix):
+    """Write a voice sample to this session's sample dir and return a small handle for session state"""
+    sample_hash = hashlib.blake2b(raw_bytes, digest_size=8).hexdigest()
+    sample_dir = _session_sample_dir()
+    sample_path = sample_dir / f"{sample_hash}.{suffix}"
+    
+    # Rewrite only when missing, so a swept or deleted file comes back on the next persist
+    if not sample_path.exists():
+        _sweep_stale_samples()
+        sample_dir.mkdir(exist_ok=True)
+        sample_path.write_bytes(raw_bytes)
+    return {'path': str(sample_path), 'hash': sample_hash, 'size': len(raw_bytes)}
+
+def _persist_upload(file, previous):
+    """Handle for an uploaded voice file, reusing the previous rerun's handle while its file exists"""
+    if previous is not None and Path(previous['path']).exists():
+        return previous
+    return dict(
+        _persist_sample(file.getvalue(), file.name.split('.')[-1]),
+        name=file.name,
+        file_id=file.file_id
+    )
+
+def _release_sample_file(path):
+    """Delete a persisted sample file unless another sample in this session still uses it"""
+    samples = st.session_state.voice_samples + st.session_state.uploaded_samples
+    if all(s['path'] != path for s in samples):
+        Path(path).unlink(missing_ok=True)
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _sample_mcep_mean(raw_bytes, suffix):
+    """Mean mel-cepstrum of one voice sample, cached per sample so re-analysis only processes new ones"""
+    audio, sr = _load_audio(raw_bytes, suffix, sr=WORLD_SAMPLE_RATE)
+    
+    if len(audio) <= sr // 10:  # At least 0.1 seconds
+        return None
+    
+    # Digital silence has no timbre and would pull the template toward the log floor;
+    # np.any stops at the first non-zero sample, so this is cheap on real recordings
+    if not np.any(audio):
+        return None
+    
+    # Extract spectral features using WORLD vocoder; only the envelope mean is kept, so
+    # DIO + StoneMask is accurate enough for F0 and much cheaper than Harvest
+    wav = audio.astype(np.float64)
+    coarse_f0, t = pw.dio(wav, sr, frame_period=ANALYSIS_FRAME_PERIOD)
+    f0 = pw.stonemask(wav, coarse_f0, t, sr)
+    sp = pw.cheaptrick(wav, f0, t, sr)
+    
+    # Convert to mel-cepstral coefficients (log taken in place; sp isn't needed afterwards)
+    np.add(sp, 1e-8, out=sp)
+    np.log(sp, out=sp)
+    mcep = pysptk.sptk.mcep(sp, MCEP_ORDER, MCEP_ALPHA)
+    return mcep.mean(axis=0)
+
+def _sample_file_mcep_mean(path):
+    """Read a persisted voice sample and return its (cached) mean mel-cepstrum"""
+    sample_path = Path(path)
+    return _sample_mcep_mean(sample_path.read_bytes(), sample_path.suffix.lstrip('.'))
+
+def _template_cache_path(voice_samples, uploaded_samples):
+    """On-disk location of the timbre template for this exact set of voice samples"""
+    # Combine the per-sample digests instead of re-hashing the audio; the analysis settings
+    # (rate, frame period, F0 method as used in _sample_mcep_mean, mcep order/alpha) are part
+    # of the key so changing them never loads a template from another domain
+    settings = f"{WORLD_SAMPLE_RATE}:{ANALYSIS_FRAME_PERIOD}:dio+stonemask:{MCEP_ORDER}:{MCEP_ALPHA}"
+    h = hashlib.blake2b(settings.encode(), digest_size=16)
+    for sample in voice_samples + uploaded_samples:
+        h.update(sample['hash'].encode())
+    return TEMPLATE_CACHE_DIR / f"{h.hexdigest()}.npy"
+
+def _save_template(cache_path, template):
+    """Write a template to the disk cache atomically; failures only mean it isn't persisted"""
+    tmp_path = None
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix=".tmp", delete=False) as tmp_file:
+            tmp_path = tmp_file.name
+            np.save(tmp_file, template)
+        # Readers see either no file or a complete one, never a partial write
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Read-only home or full disk; don't leave the partial temp file behind
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
 
-@st.cache_resource
 def create_timbre_template(voice_samples, uploaded_samples):
     """Create timbre template from voice samples using mel-cepstral analysis"""
     try:
+        # Reuse a template saved by an earlier session for the same samples
+        cache_path = _template_cache_path(voice_samples, uploaded_samples)
+        try:
+            template = np.load(cache_path)
+            if template.shape == (MCEP_ORDER + 1,):
+                st.success("✅ Timbre template loaded from a previous analysis of these samples")
+                return template
+        except Exception:
+            pass  # Not cached yet, or unreadable/truncated; treat as a miss and analyze below
+        
         all_mceps = []
         
-        # Process recorded samples
-        for sample in voice_samples:
-            try:
-                # Convert bytes to audio
-                audio_bytes = io.BytesIO(sample['bytes'])
-                wav, sr = librosa.load(audio_bytes, sr=16000, mono=True)
-                
-                if len(wav) > 1600:  # At least 0.1 seconds
-                    # Extract spectral features using WORLD vocoder
-                    f0, t = pw.harvest(wav.astype(np.float64), sr, frame_period=5.0)
-                    sp = pw.cheaptrick(wav.astype(np.float64), f0, t, sr)
-                    
-                    # Convert to mel-cepstral coefficients
-                    mcep = pysptk.sptk.mcep(np.log(sp + 1e-8), 24, 0.55)
-                    all_mceps.append(mcep.mean(axis=0))
-                    
-            except Exception as e:
-                st.warning(f"Skipped one recorded sample: {str(e)}")
-                continue
+        # Analyze recorded and uploaded samples concurrently; decoding (libsndfile, soxr) and
+        # WORLD run in native code. Workers get the script context so the cached helpers work.
+        samples = (
+            [("Skipped one recorded sample", s) for s in voice_samples] +
+            [("Skipped uploaded file", s) for s in uploaded_samples]
+        )
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(samples), os.cpu_count() or 1)),
+            initializer=add_script_run_ctx,
+            initargs=(None, get_script_run_ctx())
+        ) as executor:
+            futures = [executor.submit(_sample_file_mcep_mean, s['path']) for _, s in samples]
         
-        # Process uploaded samples
-        for uploaded_file in uploaded_samples:
+        for (skip_message, _), future in zip(samples, futures):
             try:
-                uploaded_file.seek(0)
-                wav, sr = librosa.load(uploaded_file, sr=16000, mono=True)
-                
-                if len(wav) > 1600:
-                    f0, t = pw.harvest(wav.astype(np.float64), sr, frame_period=5.0)
-                    sp = pw.cheaptrick(wav.astype(np.float64), f0, t, sr)
-                    mcep = pysptk.sptk.mcep(np.log(sp + 1e-8), 24, 0.55)
-                    all_mceps.append(mcep.mean(axis=0))
+                mcep_mean = future.result()
+                if mcep_mean is not None:
+                    all_mceps.append(mcep_mean)
                     
             except Exception as e:
-                st.warning(f"Skipped uploaded file: {str(e)}")
+                st.warning(f"{skip_message}: {str(e)}")
                 continue
         
         if len(all_mceps) > 0:
             # Average all mel-cepstral coefficients to create timbre template
             template = np.mean(all_mceps, axis=0)
             st.success(f"✅ Timbre template created from {len(all_mceps)} voice samples")
+            
+            # Only persist complete analyses, so a transient failure on one sample doesn't
+            # become a permanent partial template
+            if len(all_mceps) == len(samples):
+                _save_template(cache_path, template)
             return template
         else:
             st.error("Could not process any voice samples")
@@ -82,45 +276,190 @@ def create_timbre_template(voice_samples, uploaded_samples):
         st.error(f"Error creating timbre template: {str(e)}")
         return None
 
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _analyze_vocal(vocal_audio, sample_rate):
+    """WORLD analysis of the vocal track, shared across morphs so strength changes only re-synthesize"""
+    # WORLD needs contiguous float64; the decoded/resampled track is float32, so this is the
+    # one conversion copy of the waveform
+    wav = np.ascontiguousarray(vocal_audio, dtype=np.float64)
+    
+    # WORLD vocoder analysis
+    f0, t = pw.harvest(wav, sample_rate, frame_period=FRAME_PERIOD)
+    sp = pw.cheaptrick(wav, f0, t, sample_rate)
+    ap = pw.d4c(wav, f0, t, sample_rate)
+    
+    # Convert spectral envelope to mel-cepstral coefficients; the log is taken in place since
+    # the morphed envelope is rebuilt from mcep and sp isn't needed afterwards
+    np.add(sp, 1e-8, out=sp)
+    np.log(sp, out=sp)
+    mcep = pysptk.sptk.mcep(sp, MCEP_ORDER, MCEP_ALPHA)
+    
+    # Keep the cached result small: D4C's aperiodicity is band-based, so the coded form
+    # decodes back to it, and the full-resolution envelope is rebuilt from the blended mcep
+    return f0, mcep, pw.code_aperiodicity(ap, sample_rate)
+
+def _normalize_peak(audio):
+    """Scale audio to a 0.9 peak as float32, zeroing NaN/inf samples if there are any"""
+    # min/max reductions avoid an np.abs temporary, and the scale and float32 cast happen
+    # in one pass instead of a separate astype copy
+    peak = max(-audio.min(), audio.max())
+    if not np.isfinite(peak):
+        # min/max propagate NaN/inf, so the extra cleanup pass only runs when it's needed
+        audio = np.nan_to_num(audio, posinf=0.0, neginf=0.0)
+        peak = max(-audio.min(), audio.max())
+    scale = 0.9 / peak if peak > 0 else 1.0
+    return np.multiply(audio, scale, dtype=np.float32)
+
 def morph_vocal_track(vocal_audio, timbre_template, sample_rate, alpha=0.4):
     """Apply voice morphing using WORLD vocoder and spectral envelope modification"""
     try:
         # Resample to 16kHz for WORLD vocoder
-        if sample_rate != 16000:
-            vocal_audio = librosa.resample(vocal_audio, orig_sr=sample_rate, target_sr=16000)
-            sample_rate = 16000
-        
-        # Ensure audio is in correct format for WORLD
-        wav = vocal_audio.astype(np.float64)
-        
-        # WORLD vocoder analysis
-        f0, t = pw.harvest(wav, sample_rate, frame_period=5.0)
-        sp = pw.cheaptrick(wav, f0, t, sample_rate)
-        ap = pw.d4c(wav, f0, t, sample_rate)
+        if sample_rate != WORLD_SAMPLE_RATE:
+            vocal_audio = _resample(vocal_audio, sample_rate, WORLD_SAMPLE_RATE)
+            sample_rate = WORLD_SAMPLE_RATE
         
-        # Convert spectral envelope to mel-cepstral coefficients
-        mcep = pysptk.sptk.mcep(np.log(sp + 1e-8), 24, 0.55)
+        # At full original weight the blend keeps the vocal's own envelope; skip the WORLD
+        # round trip but return the same 16 kHz, peak-normalized output as a morph
+        if alpha >= 0.999:
+            return _normalize_peak(vocal_audio), sample_rate
         
-        # Morph spectral envelope toward user's timbre
-        for i in range(len(mcep)):
-            mcep[i] = alpha * mcep[i] + (1 - alpha) * timbre_template
+        # Analysis is cached per vocal track; only the blend and synthesis depend on alpha
+        f0, vocal_mcep, coded_ap = _analyze_vocal(vocal_audio, sample_rate)
         
-        # Convert back to spectral envelope
-        sp_morphed = np.exp(pysptk.sptk.mc2sp(mcep, 0.55, sample_rate // 2))
+        if alpha <= 0.001:
+            # Every frame collapses to the template; convert it once and repeat the envelope
+            sp_template = np.exp(pysptk.sptk.mc2sp(
+                np.asarray(timbre_template, dtype=np.float64), MCEP_ALPHA, sample_rate // 2
+            ))
+            sp_morphed = np.tile(sp_template, (len(f0), 1))
+        else:
+            # Morph spectral envelope toward user's timbre on the (frames, order+1) matrix with the
+            # template term broadcast over all frames; the first product copies, so the cached
+            # analysis is never modified and the addition can run in place
+            mcep = alpha * vocal_mcep
+            mcep += (1 - alpha) * np.asarray(timbre_template, dtype=mcep.dtype)
+            
+            # Convert back to spectral envelope
+            sp_morphed = np.exp(pysptk.sptk.mc2sp(mcep, MCEP_ALPHA, sample_rate // 2))
+        ap = pw.decode_aperiodicity(coded_ap, sample_rate, pw.get_cheaptrick_fft_size(sample_rate))
         
         # Synthesize morphed audio
-        morphed_audio = pw.synthesize(f0, sp_morphed, ap, sample_rate, frame_period=5.0)
+        morphed_audio = pw.synthesize(f0, sp_morphed, ap, sample_rate, frame_period=FRAME_PERIOD)
         
-        # Normalize
-        if np.max(np.abs(morphed_audio)) > 0:
-            morphed_audio = morphed_audio / np.max(np.abs(morphed_audio)) * 0.9
-        
-        return morphed_audio.astype(np.float32), sample_rate
+        return _normalize_peak(morphed_audio), sample_rate
         
     except Exception as e:
         st.error(f"Voice morphing error: {str(e)}")
         return None, None
 
+def _delete_recorded_sample(sample_id):
+    """Remove a recorded sample by id, so a click from a stale render can't hit the wrong one"""
+    removed = [s for s in st.session_state.voice_samples if s['id'] == sample_id]
+    st.session_state.voice_samples = [
+        s for s in st.session_state.voice_samples if s['id'] != sample_id
+    ]
+    for sample in removed:
+        _release_sample_file(sample['path'])
+
+# st.fragment (Streamlit >= 1.37) reruns only the decorated function on widget events;
+# older versions fall back to full-script reruns
+_fragment = getattr(st, "fragment", lambda func: func)
+
+def render_recorded_samples():
+    """Recorded sample players with per-sample delete buttons"""
+    if st.session_state.voice_samples:
+        st.write(f"**Recorded Samples: {len(st.session_state.voice_samples)}**")
+        for sample in st.session_state.voice_samples:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                if Path(sample['path']).exists():
+                    st.audio(sample['path'], format="audio/wav")
+                else:
+                    st.write("(Sample expired, please record it again)")
+            with col2:
+                # Keyed by the sample's id so deleting one doesn't re-key every widget after it;
+                # removed in the callback, which runs before the click's single full rerun, so
+                # the list, the sample count and the Analyze button all reflect the delete
+                st.button(
+                    "🗑️",
+                    key=f"delete_rec_{sample['id']}",
+                    help="Delete sample",
+                    on_click=_delete_recorded_sample,
+                    args=(sample['id'],)
+                )
+
+@_fragment
+def render_morph_step():
+    """Step 3 controls and results; slider changes don't rerun Steps 1 and 2"""
+    st.markdown("---")
+    st.header("🎭 Step 3: Generate Voice-Morphed Audio")
+    
+    # Morphing strength slider
+    alpha = st.slider(
+        "Morphing Strength",
+        min_value=0.1,
+        max_value=0.8,
+        value=0.4,
+        step=0.1,
+        help="Higher values = more of your voice characteristics"
+    )
+    
+    strength_labels = {
+        0.1: "Very Subtle",
+        0.2: "Subtle", 
+        0.3: "Moderate",
+        0.4: "Strong",
+        0.5: "Very Strong",
+        0.6: "Intense",
+        0.7: "Maximum",
+        0.8: "Extreme"
+    }
+    
+    st.write(f"**Morphing Level: {strength_labels.get(alpha, 'Custom')}**")
+    
+    # Generate morphed voice
+    if st.button("🎵 Morph Voice Now!", type="primary", use_container_width=True):
+        vocal_audio, sample_rate = st.session_state.vocal_track
+        
+        with st.spinner("🔧 Applying WORLD vocoder analysis..."):
+            morphed_audio, morphed_sr = morph_vocal_track(
+                vocal_audio, 
+                st.session_state.timbre_template, 
+                sample_rate, 
+                alpha=alpha
+            )
+        
+        if morphed_audio is not None:
+            st.success("🎉 Voice morphing complete!")
+            
+            # Display results
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("🎵 Original Vocal")
+                st.audio(_encode_audio(vocal_audio, sample_rate, preview=True), format="audio/wav")
+            
+            with col2:
+                st.subheader("🎤 Your Morphed Voice")
+                st.audio(_encode_audio(morphed_audio, morphed_sr), format="audio/wav")
+                
+                # Download button (lossless FLAC is roughly half the size of PCM WAV)
+                st.download_button(
+                    label="📥 Download Morphed Voice",
+                    data=_encode_audio(morphed_audio, morphed_sr, format='FLAC'),
+                    file_name=f"morphed_voice_strength_{alpha}.flac",
+                    mime="audio/flac",
+                    use_container_width=True
+                )
+            
+            # Analysis info
+            st.info(f"🔬 Applied {alpha*100:.0f}% of your voice characteristics using advanced spectral morphing")
+    
+    # Reset option (outside the morph branch, which is never re-entered on the click's rerun)
+    if st.button("🔄 Start Over", use_container_width=True):
+        reset_session()
+        st.rerun()
+
 def main():
     init_session_state()
     
@@ -134,13 +473,17 @@ def main():
     uploaded_vocal = st.file_uploader(
         "Choose vocal audio file (clean vocals only, no instruments)",
         type=['mp3', 'wav', 'flac', 'm4a', 'ogg'],
-        help="Upload a clean vocal track for best results"
+        help="Upload a clean vocal track for best results",
+        key=f"vocal_file_{st.session_state.widget_generation}"
     )
     
     if uploaded_vocal is not None:
         try:
-            # Load vocal track
-            vocal_audio, sample_rate = librosa.load(uploaded_vocal, sr=None)
+            # Load vocal track (cached on the file contents)
+            vocal_audio, sample_rate = _load_audio(
+                uploaded_vocal.getvalue(),
+                uploaded_vocal.name.split('.')[-1]
+            )
             st.session_state.vocal_track = (vocal_audio, sample_rate)
             
             st.success("✅ Vocal track uploaded successfully!")
@@ -157,10 +500,7 @@ def main():
             
             # Audio preview
             st.subheader("🎧 Preview Original Vocal")
-            vocal_bytes = io.BytesIO()
-            sf.write(vocal_bytes, vocal_audio, sample_rate, format='WAV')
-            vocal_bytes.seek(0)
-            st.audio(vocal_bytes, format="audio/wav")
+            st.audio(_encode_audio(vocal_audio, sample_rate, preview=True), format="audio/wav")
             
         except Exception as e:
             st.error(f"Error loading vocal track: {str(e)}")
@@ -184,24 +524,19 @@ def main():
                 stop_prompt="⏹️ Stop Recording",
                 just_once=True,
                 use_container_width=True,
-                key=f"voice_recorder_{len(st.session_state.voice_samples)}"
+                key=f"voice_recorder_{st.session_state.widget_generation}_{len(st.session_state.voice_samples)}"
             )
             
             if audio_data is not None:
-                st.session_state.voice_samples.append(audio_data)
+                # Persist the recording and keep only a small handle in session state
+                st.session_state.voice_samples.append(dict(
+                    _persist_sample(audio_data['bytes'], audio_data.get('format', 'wav')),
+                    id=uuid.uuid4().hex
+                ))
                 st.success(f"✅ Voice sample {len(st.session_state.voice_samples)} recorded!")
             
             # Show recorded samples
-            if st.session_state.voice_samples:
-                st.write(f"**Recorded Samples: {len(st.session_state.voice_samples)}**")
-                for i, sample in enumerate(st.session_state.voice_samples):
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.audio(sample['bytes'], format="audio/wav")
-                    with col2:
-                        if st.button("🗑️", key=f"delete_rec_{i}", help="Delete sample"):
-                            st.session_state.voice_samples.pop(i)
-                            st.rerun()
+            render_recorded_samples()
         
         with tab2:
             st.subheader("Upload Voice Files")
@@ -211,21 +546,33 @@ def main():
                 "Select your voice audio files",
                 type=['mp3', 'wav', 'flac', 'm4a', 'ogg'],
                 accept_multiple_files=True,
-                key="voice_files"
+                key=f"voice_files_{st.session_state.widget_generation}"
             )
             
+            # Snapshot each upload to disk once; later reruns match it by the uploader's file_id,
+            # so unchanged uploads are neither re-hashed nor re-written. Session state keeps
+            # handles, not UploadedFile objects
+            previous_uploads = st.session_state.uploaded_samples
+            previous_by_id = {s['file_id']: s for s in previous_uploads}
+            st.session_state.uploaded_samples = [
+                _persist_upload(file, previous_by_id.get(file.file_id))
+                for file in uploaded_voice_files or []
+            ]
+            
+            # Remove files of uploads that were taken out of the uploader
+            for sample in previous_uploads:
+                _release_sample_file(sample['path'])
+            
             if uploaded_voice_files:
-                st.session_state.uploaded_samples = uploaded_voice_files
                 st.success(f"✅ {len(uploaded_voice_files)} voice files uploaded!")
                 
                 # Preview uploaded files
-                for i, file in enumerate(uploaded_voice_files):
+                for sample in st.session_state.uploaded_samples:
                     col1, col2 = st.columns([3, 1])
                     with col1:
-                        st.write(f"**{file.name}** ({file.size/1024:.1f} KB)")
+                        st.write(f"**{sample['name']}** ({sample['size']/1024:.1f} KB)")
                         try:
-                            file.seek(0)
-                            st.audio(file, format="audio/wav")
+                            st.audio(sample['path'], format="audio/wav")
                         except:
                             st.write("(Preview not available)")
                     with col2:
@@ -238,6 +585,7 @@ def main():
         if total_samples >= 3:
             if st.button("🔬 Analyze My Voice Characteristics", type="primary", use_container_width=True):
                 with st.spinner("Analyzing your voice timbre using mel-cepstral analysis..."):
+                    # Samples analyzed before come straight from the per-sample cache
                     template = create_timbre_template(
                         st.session_state.voice_samples,
                         st.session_state.uploaded_samples
@@ -252,83 +600,7 @@ def main():
     # =================== STEP 3: VOICE MORPHING ===================
     if (st.session_state.vocal_track is not None and 
         st.session_state.timbre_template is not None):
-        
-        st.markdown("---")
-        st.header("🎭 Step 3: Generate Voice-Morphed Audio")
-        
-        # Morphing strength slider
-        alpha = st.slider(
-            "Morphing Strength",
-            min_value=0.1,
-            max_value=0.8,
-            value=0.4,
-            step=0.1,
-            help="Higher values = more of your voice characteristics"
-        )
-        
-        strength_labels = {
-            0.1: "Very Subtle",
-            0.2: "Subtle", 
-            0.3: "Moderate",
-            0.4: "Strong",
-            0.5: "Very Strong",
-            0.6: "Intense",
-            0.7: "Maximum",
-            0.8: "Extreme"
-        }
-        
-        st.write(f"**Morphing Level: {strength_labels.get(alpha, 'Custom')}**")
-        
-        # Generate morphed voice
-        if st.button("🎵 Morph Voice Now!", type="primary", use_container_width=True):
-            vocal_audio, sample_rate = st.session_state.vocal_track
-            
-            with st.spinner("🔧 Applying WORLD vocoder analysis..."):
-                morphed_audio, morphed_sr = morph_vocal_track(
-                    vocal_audio, 
-                    st.session_state.timbre_template, 
-                    sample_rate, 
-                    alpha=alpha
-                )
-            
-            if morphed_audio is not None:
-                st.success("🎉 Voice morphing complete!")
-                
-                # Display results
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.subheader("🎵 Original Vocal")
-                    original_bytes = io.BytesIO()
-                    sf.write(original_bytes, vocal_audio, sample_rate, format='WAV')
-                    original_bytes.seek(0)
-                    st.audio(original_bytes, format="audio/wav")
-                
-                with col2:
-                    st.subheader("🎤 Your Morphed Voice")
-                    morphed_bytes = io.BytesIO()
-                    sf.write(morphed_bytes, morphed_audio, morphed_sr, format='WAV')
-                    morphed_bytes.seek(0)
-                    st.audio(morphed_bytes, format="audio/wav")
-                    
-                    # Download button
-                    st.download_button(
-                        label="📥 Download Morphed Voice",
-                        data=morphed_bytes.getvalue(),
-                        file_name=f"morphed_voice_strength_{alpha}.wav",
-                        mime="audio/wav",
-                        use_container_width=True
-                    )
-                
-                # Analysis info
-                st.info(f"🔬 Applied {alpha*100:.0f}% of your voice characteristics using advanced spectral morphing")
-                
-                # Reset option
-                if st.button("🔄 Start Over", use_container_width=True):
-                    for key in ['vocal_track', 'voice_samples', 'uploaded_samples', 'timbre_template']:
-                        if key in st.session_state:
-                            del st.session_state[key]
-                    st.rerun()
+        render_morph_step()
     
     # Footer
     st.markdown("---")